@@ -1,6 +1,29 @@
-import os, time, json, requests
+import os, time, asyncio, tempfile, orjson, requests, httpx
+from functools import lru_cache
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-TOKEN_FILE = "token_store.json"
+# Seconds before expiry at which a token is treated as stale
+TOKEN_SKEW = 30
+
+@lru_cache(maxsize=1)
+def token_path():
+    # Shared by every worker on the host; /tmp is the writable dir on serverless images
+    return Path(os.getenv("DHAN_TOKEN_PATH", "/tmp/dhan_token.json"))
+
+# Shared keep-alive session for Dhan REST calls (login + orders)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.1)))
+
+# Async counterpart for callers running on an event loop (no threadpool hop per call).
+# HTTP/2 multiplexes concurrent order calls over one TLS connection, so a small pool is enough;
+# short connect timeout fails fast on a dead upstream instead of holding the order path
+CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(5.0, connect=2.0),
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=32),
+)
 
 class DhanAuth:
     def __init__(self):
@@ -9,47 +32,120 @@ class DhanAuth:
         self.base_url = os.getenv("DHAN_BASE_URL", "https://api.dhan.co")
         self.access_token = None
         self.expires_at = 0
+        self.refresh_epoch = 0  # bumped whenever the token changes
+        self.headers = {}  # auth headers for the current token, rebuilt only when it changes
+        self._refresh_lock = asyncio.Lock()
         self._load_token()
 
+    def _set_token(self, access_token, expires_at):
+        self.access_token = access_token
+        self.expires_at = expires_at
+        self.refresh_epoch += 1
+        self.headers = {"access-token": access_token, "client-id": self.client_id}
+
+    def _token_valid(self):
+        return bool(self.access_token) and time.time() < self.expires_at - TOKEN_SKEW
+
     def _load_token(self):
-        if os.path.exists(TOKEN_FILE):
-            with open(TOKEN_FILE, "r") as f:
-                data = json.load(f)
-                self.access_token = data.get("access_token")
-                self.expires_at = data.get("expires_at", 0)
+        """Adopt a token another worker already stored, if it is still in date"""
+        # Shared dir: only trust a file this user owns that nobody else can read or write;
+        # checks run on the opened fd, so the file can't be swapped in between
+        try:
+            fd = os.open(token_path(), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_uid != os.getuid() or st.st_mode & 0o077:
+                    return
+                data = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return
+        if data.get("access_token") and data.get("expires_at", 0) - TOKEN_SKEW > time.time():
+            self._set_token(data["access_token"], data["expires_at"])
 
     def _save_token(self):
-        with open(TOKEN_FILE, "w") as f:
-            json.dump({
-                "access_token": self.access_token,
-                "expires_at": self.expires_at
-            }, f)
+        # Owner-only (0600) temp file, created exclusively under a random name (never follows a
+        # planted symlink), then renamed so other workers never read a half-written file
+        p = token_path()
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=f".{p.name}.", suffix=".tmp", dir=p.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(orjson.dumps({
+                    "access_token": self.access_token,
+                    "expires_at": self.expires_at
+                }))
+            os.replace(tmp, p)
+        except OSError as e:
+            print("⚠️ Could not persist token:", e)
+            if tmp:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
 
     def get_token(self):
-        if self.access_token and time.time() < self.expires_at:
+        if self._token_valid():
+            return self.access_token
+        self._load_token()  # another worker may have logged in already
+        if self._token_valid():
             return self.access_token
         return self._login_for_new_token()
 
+    async def aget_token(self):
+        """Awaitable get_token: in-memory hit, else async re-login (never blocks the loop)"""
+        if self._token_valid():
+            return self.access_token
+        self._load_token()
+        if self._token_valid():
+            return self.access_token
+        return await self.arefresh(self.refresh_epoch)
+
+    def _login_payload(self):
+        return {
+            "client_id": self.client_id,
+            "client_secret": self.api_secret
+        }
+
+    def _store_login(self, data):
+        self._set_token(data["access_token"], time.time() + 23 * 3600)   # assume 23 h validity
+        self._save_token()
+        print("✅ Token refreshed successfully.")
+
+    def _login_failed(self, e):
+        print("❌ Login failed:", e)
+        if not self.access_token:
+            raise RuntimeError("No valid Dhan access token!")
+
     def _login_for_new_token(self):
         """Re-authenticate using client_id + api_secret"""
         try:
             print("🔑 Requesting new Dhan access token ...")
-            r = requests.post(
-                f"{self.base_url}/login",
-                json={
-                    "client_id": self.client_id,
-                    "client_secret": self.api_secret
-                },
-                timeout=10
-            )
+            r = SESSION.post(f"{self.base_url}/login", json=self._login_payload(), timeout=10)
             r.raise_for_status()
-            data = r.json()
-            self.access_token = data["access_token"]
-            self.expires_at = time.time() + 23 * 3600   # assume 23 h validity
-            self._save_token()
-            print("✅ Token refreshed successfully.")
+            self._store_login(r.json())
         except Exception as e:
-            print("❌ Login failed:", e)
-            if not self.access_token:
-                raise RuntimeError("No valid Dhan access token!")
+            self._login_failed(e)
         return self.access_token
+
+    async def arefresh(self, seen_epoch=None):
+        """
+        Async re-authentication (same endpoint/payload as _login_for_new_token).
+        Pass the refresh_epoch the caller's token came from: callers queued behind a login
+        that already replaced that token reuse the new one instead of logging in again.
+        """
+        if seen_epoch is None:
+            seen_epoch = self.refresh_epoch
+        async with self._refresh_lock:
+            if self.refresh_epoch != seen_epoch and self._token_valid():
+                return self.access_token
+            try:
+                print("🔑 Requesting new Dhan access token ...")
+                r = await CLIENT.post(f"{self.base_url}/login", json=self._login_payload(), timeout=httpx.Timeout(10.0, connect=2.0))
+                r.raise_for_status()
+                self._store_login(r.json())
+            except Exception as e:
+                self._login_failed(e)
+            return self.access_token
@@ -1,5 +1,5 @@
-import os, requests
-from dhan_auth import DhanAuth
+import os
+from dhan_auth import DhanAuth, SESSION, CLIENT
 
 auth = DhanAuth()
 CAPITAL = float(os.getenv("CAPITAL", 100000))
@@ -9,15 +9,8 @@ def _risk_ok(qty, price):
     est_value = qty * (price or 1000)
     return est_value <= CAPITAL * MAX_RISK
 
-def place_order(symbol, qty, side, price=None, order_type="MARKET"):
-    token = auth.get_token()
-    headers = {
-        "access-token": token,
-        "client-id": auth.client_id,
-        "Content-Type": "application/json"
-    }
-
-    payload = {
+def _order_payload(symbol, qty, side, price, order_type):
+    return {
         "transaction_type": side.upper(),
         "exchange_segment": "NSE_EQ",
         "product_type": "INTRADAY",
@@ -28,15 +21,25 @@ def place_order(symbol, qty, side, price=None, order_type="MARKET"):
         "after_market_order": False
     }
 
+def place_order(symbol, qty, side, price=None, order_type="MARKET"):
+    token = auth.get_token()
+    headers = {
+        "access-token": token,
+        "client-id": auth.client_id,
+        "Content-Type": "application/json"
+    }
+
+    payload = _order_payload(symbol, qty, side, price, order_type)
+
     if not _risk_ok(qty, price):
         return {"status": "error", "reason": "Risk limit exceeded."}
 
-    r = requests.post(f"{auth.base_url}/orders", headers=headers, json=payload)
+    r = SESSION.post(f"{auth.base_url}/orders", headers=headers, json=payload, timeout=10)
     if r.status_code == 401:
         # token expired: re-login once
         auth._login_for_new_token()
         headers["access-token"] = auth.access_token
-        r = requests.post(f"{auth.base_url}/orders", headers=headers, json=payload)
+        r = SESSION.post(f"{auth.base_url}/orders", headers=headers, json=payload, timeout=10)
     try:
         r.raise_for_status()
         return r.json()
@@ -45,16 +48,51 @@ def place_order(symbol, qty, side, price=None, order_type="MARKET"):
 
 def order_status(order_id):
     token = auth.get_token()
-    r = requests.get(
+    r = SESSION.get(
         f"{auth.base_url}/orders/{order_id}",
-        headers={"access-token": token, "client-id": auth.client_id}
+        headers={"access-token": token, "client-id": auth.client_id},
+        timeout=10
     )
     return r.json()
 
 def cancel_order(order_id):
     token = auth.get_token()
-    r = requests.delete(
+    r = SESSION.delete(
         f"{auth.base_url}/orders/{order_id}",
-        headers={"access-token": token, "client-id": auth.client_id}
+        headers={"access-token": token, "client-id": auth.client_id},
+        timeout=10
     )
     return r.json()
+
+# ---------------------------------------------------------
+# Async variants (shared pooled httpx client) for async handlers
+# ---------------------------------------------------------
+async def aplace_order(symbol, qty, side, price=None, order_type="MARKET"):
+    if not _risk_ok(qty, price):
+        return {"status": "error", "reason": "Risk limit exceeded."}
+
+    # auth.headers is prebuilt per token; httpx adds Content-Type for json=
+    await auth.aget_token()
+    epoch = auth.refresh_epoch
+    payload = _order_payload(symbol, qty, side, price, order_type)
+
+    r = await CLIENT.post(f"{auth.base_url}/orders", headers=auth.headers, json=payload)
+    if r.status_code == 401:
+        # token expired: re-login once (shared with any concurrent 401s on the same token)
+        await auth.arefresh(epoch)
+        r = await CLIENT.post(f"{auth.base_url}/orders", headers=auth.headers, json=payload)
+    try:
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        return {"status": "error", "reason": str(e)}
+
+async def aorder_status(order_id):
+    await auth.aget_token()
+    r = await CLIENT.get(f"{auth.base_url}/orders/{order_id}", headers=auth.headers)
+    return r.json()
+
+async def acancel_order(order_id):
+    await auth.aget_token()
+    r = await CLIENT.delete(f"{auth.base_url}/orders/{order_id}", headers=auth.headers)
+    return r.json()
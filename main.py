@@ -7,35 +7,111 @@
 # =========================================================
 
 from fastapi import FastAPI, Query, HTTPException
-from datetime import datetime, timedelta, date
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone, date
+import asyncio
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import csv
+import hmac
 import time
-from io import StringIO
-from typing import Dict, List, Any, Optional
+import heapq
+import io
+import tempfile
+import sys
+import threading
+from functools import lru_cache
+from operator import itemgetter
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional, Tuple, Union
 
 # =========================================================
 # 🔧 CONFIGURATION
 # =========================================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await CLIENT.aclose()
+
 app = FastAPI(
     title="Dhan FastAPI Bridge",
     version="5.3.0",
-    description="BTST scan (NSE EQ universe), option chain, option momentum, news sentiment."
+    description="BTST scan (NSE EQ universe), option chain, option momentum, news sentiment.",
+    lifespan=lifespan,
 )
 
 DHAN_ACCESS_TOKEN = os.getenv("DHAN_ACCESS_TOKEN")
 DHAN_CLIENT_ID = os.getenv("DHAN_CLIENT_ID")
 MARKETAUX_API_KEY = os.getenv("MARKETAUX_API_KEY")
+GPT_API_KEY = os.getenv("GPT_API_KEY")  # optional: when set, callers must send it as x-api-key
 
 DHAN_BASE = "https://api.dhan.co/v2"
+
+# Quote POST headers: token + client id are fixed env values, so one shared dict (httpx never mutates it)
+_DHAN_HEADERS = {
+    "access-token": DHAN_ACCESS_TOKEN,
+    "client-id": DHAN_CLIENT_ID,
+    "Content-Type": "application/json",
+}
 MASTER_CSV = "https://images.dhan.co/api-data/api-scrip-master-detailed.csv"
 
+# Master CSV download (runs in threadpool); pooled keep-alive + retry on connection errors
 SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.1)))
+
+# Shared async client for Dhan / MarketAux calls (keep-alive pool, no threadpool hop).
+# HTTP/2 lets concurrent quote chunks multiplex over one TLS connection.
+CLIENT = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=10.0,
+)
 
 # Master CSV cache (warm instance only)
 MASTER_CACHE_TTL = 6 * 60 * 60  # 6 hours
-_MASTER_CACHE: Dict[str, Any] = {"fetched_at": 0.0, "rows": None, "nse_eq_universe": None}
+_MASTER_CACHE: Dict[str, Any] = {
+    "fetched_at": 0.0,
+    "rows": None,
+    "version": 0,  # bumped on every rows swap; keys the resolver memo
+    # derived from rows, rebuilt lazily after each refresh
+    "nse_eq_universe": None,
+    "options_index": None,
+    "symbol_index": None,
+}
+_DERIVED_KEYS = ("nse_eq_universe", "options_index", "symbol_index")
+
+# Only the master CSV columns this app reads (the file has many more)
+MASTER_COLUMNS = (
+    "EXCH_ID", "SEGMENT", "SERIES", "INSTRUMENT", "SECURITY_ID",
+    "SYMBOL_NAME", "DISPLAY_NAME", "UNDERLYING_SYMBOL",
+    "OPTION_TYPE", "STRIKE_PRICE", "LOT_SIZE", "SM_EXPIRY_DATE",
+)
+
+# Low-cardinality columns (a handful of distinct values over ~200k rows): interned at parse
+# time (and again after a snapshot load) so every row shares one str object per value
+MASTER_INTERN_COLUMNS = (
+    "EXCH_ID", "SEGMENT", "SERIES", "INSTRUMENT",
+    "UNDERLYING_SYMBOL", "OPTION_TYPE", "LOT_SIZE", "SM_EXPIRY_DATE",
+)
+
+# Dhan INSTRUMENT is a small enum: set membership instead of substring search
+OPTION_INSTRUMENTS = frozenset({"OPTIDX", "OPTSTK", "OPTFUT", "OPTCUR"})
+OPTION_TYPES = frozenset({"CE", "PE"})
+
+# Bump when the cached row layout changes so stale /tmp snapshots are ignored
+MASTER_SCHEMA = 4
+
+_MASTER_LOCK = threading.Lock()  # one refresh at a time across threadpool workers
+_DERIVED_LOCK = threading.Lock()  # version check + derived-index store vs. invalidation
+
+# Parsed master rows persisted to local disk so cold starts skip download + parse
+MASTER_DISK_CACHE = os.getenv("MASTER_DISK_CACHE", "/tmp/dhan_master.json")
 
 # Short scan cache to avoid repeated 429 on refresh
 SCAN_CACHE_TTL = 25  # seconds
@@ -44,21 +120,22 @@ _SCAN_CACHE: Dict[str, Dict[str, Any]] = {}  # key -> {"t": float, "resp": dict}
 # =========================================================
 # 🕒 UTIL
 # =========================================================
+# Fixed offset (India has no DST): no tzdata lookup needed on slim serverless images
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
+# Bound once: the timestamp/probe paths below run on every request
+_now = time.time
+
+@lru_cache(maxsize=1)
+def _ist_str_at(epoch_sec: int) -> str:
+    return datetime.fromtimestamp(epoch_sec, IST).strftime("%Y-%m-%d %I:%M:%S %p IST")
+
 def ist_now_str() -> str:
-    return (datetime.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d %I:%M:%S %p IST")
+    # every response carries this; strftime runs at most once per second
+    return _ist_str_at(int(_now()))
 
 def ist_today() -> date:
-    return (datetime.utcnow() + timedelta(hours=5, minutes=30)).date()
-
-def parse_last_trade_date(last_trade_time: str) -> Optional[date]:
-    if not last_trade_time or last_trade_time == "N/A":
-        return None
-    for fmt in ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M"):
-        try:
-            return datetime.strptime(last_trade_time, fmt).date()
-        except Exception:
-            continue
-    return None
+    return datetime.now(IST).date()
 
 def require_dhan_creds():
     if not DHAN_ACCESS_TOKEN or not DHAN_CLIENT_ID:
@@ -67,23 +144,168 @@ def require_dhan_creds():
 def _norm(s: str) -> str:
     return "".join(ch for ch in (s or "").upper() if ch.isalnum())
 
+# One C-level call per row instead of several dict.get() dispatches in hot filters
+_NAME_FIELDS = itemgetter("SYMBOL_NAME", "DISPLAY_NAME", "UNDERLYING_SYMBOL")
+_OPTION_FIELDS = itemgetter("_INSTR_U", "_UND_U", "_OPT_U")
+
 # =========================================================
 # 🧾 MASTER CSV (CACHED)
 # =========================================================
+def _load_master_snapshot(now: float) -> Optional[List[Dict[str, str]]]:
+    # Plain JSON (never pickle) from a shared dir: only trust a file this user owns
+    # that nobody else can write; checks run on the opened fd, so no swap in between
+    try:
+        fd = os.open(MASTER_DISK_CACHE, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return None
+    try:
+        with os.fdopen(fd, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.getuid() or st.st_mode & 0o022:
+                return None
+            if now - st.st_mtime >= MASTER_CACHE_TTL:
+                return None
+            head = orjson.loads(f.readline())
+            if head.get("schema") != MASTER_SCHEMA:
+                return None
+            cols = head["columns"]
+            loads = orjson.loads
+            rows = [dict(zip(cols, loads(line))) for line in f]
+    except Exception:
+        return None
+    _finish_rows(rows, cols)
+    _MASTER_CACHE["fetched_at"] = st.st_mtime
+    return rows
+
+def _save_master_snapshot(rows: List[Dict[str, str]]) -> None:
+    """
+    Header line {"schema", "columns"}, then one JSON array of raw column values per row:
+    key names are stored once, derived _*_U/_NAME_N fields are rebuilt on load, and rows
+    are streamed to the file instead of encoded into one big bytes object.
+    """
+    # best-effort: mkstemp (O_EXCL, 0600, random name) then atomically swap it in
+    if not rows:
+        return
+    tmp = None
+    try:
+        cols = [c for c in MASTER_COLUMNS if c in rows[0]]
+        project = itemgetter(*cols)
+        dumps, opt = orjson.dumps, orjson.OPT_APPEND_NEWLINE
+        fd, tmp = tempfile.mkstemp(prefix=".dhan_master.", suffix=".tmp", dir=os.path.dirname(MASTER_DISK_CACHE) or ".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(dumps({"schema": MASTER_SCHEMA, "columns": cols}, option=opt))
+            for r in rows:
+                f.write(dumps(project(r), option=opt))
+        os.replace(tmp, MASTER_DISK_CACHE)
+    except Exception:
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+def _parse_master_csv(stream) -> List[Dict[str, str]]:
+    # csv.reader + one comprehension: skips DictReader's per-row Python __next__ overhead,
+    # and projects each record down to MASTER_COLUMNS with a single itemgetter call
+    reader = csv.reader(stream)
+    header = next(reader, [])
+    width = len(header)
+    pos = {name: i for i, name in enumerate(header)}
+    cols = [c for c in MASTER_COLUMNS if c in pos]
+    project = itemgetter(*(pos[c] for c in cols))
+    rows = [dict(zip(cols, project(rec))) for rec in reader if len(rec) >= width]
+    _finish_rows(rows, cols)
+    return rows
+
+def _finish_rows(rows: List[Dict[str, str]], cols: List[str]) -> None:
+    # shared by the CSV parse and the snapshot load: both yield raw projected rows
+    _intern_columns(rows, [c for c in MASTER_INTERN_COLUMNS if c in cols])
+    _normalize_rows(rows)
+
+def _intern_columns(rows: List[Dict[str, str]], cols: List[str]) -> None:
+    intern = sys.intern
+    for r in rows:
+        for c in cols:
+            r[c] = intern(r[c])
+
+def _normalize_rows(rows: List[Dict[str, str]]) -> None:
+    """
+    Normalize once per refresh so request-time filters are plain ==/in on interned strings:
+      _EXCH_U/_SEG_U/_SERIES_U/_INSTR_U/_UND_U/_OPT_U = stripped + upper-cased
+      _NAME_N = _norm(SYMBOL_NAME + DISPLAY_NAME + UNDERLYING_SYMBOL) for fuzzy search
+    """
+    intern = sys.intern
+    for r in rows:
+        r["_EXCH_U"] = intern((r.get("EXCH_ID") or "").strip().upper())
+        r["_SEG_U"] = intern((r.get("SEGMENT") or "").strip().upper())
+        r["_SERIES_U"] = intern((r.get("SERIES") or "").strip().upper())
+        r["_INSTR_U"] = intern((r.get("INSTRUMENT") or "").strip().upper())
+        r["_UND_U"] = intern((r.get("UNDERLYING_SYMBOL") or "").strip().upper())
+        r["_OPT_U"] = intern((r.get("OPTION_TYPE") or "").strip().upper())
+        r["_NAME_N"] = _norm(" ".join(filter(None, _NAME_FIELDS(r))))
+
+def _invalidate_derived() -> None:
+    with _DERIVED_LOCK:
+        for k in _DERIVED_KEYS:
+            _MASTER_CACHE[k] = None
+        _MASTER_CACHE["version"] += 1
+    _resolve_cached.cache_clear()  # drop refs to the old rows now, not on LRU eviction
+
+def _derived_source() -> Tuple[int, List[Dict[str, str]]]:
+    """(version, rows) to build a derived index from. Version is read first: a swap in between
+    can only make the build look stale (skipped on store), never label old rows as current."""
+    load_master_rows()
+    version = _MASTER_CACHE["version"]
+    return version, _MASTER_CACHE["rows"]
+
+def _store_derived(key: str, version: int, value: Any) -> None:
+    # A refresh that landed mid-build already invalidated: don't pin the old-rows index until next TTL
+    with _DERIVED_LOCK:
+        if _MASTER_CACHE["version"] == version:
+            _MASTER_CACHE[key] = value
+
+def _master_fresh(now: float) -> bool:
+    return _MASTER_CACHE["rows"] is not None and (now - _MASTER_CACHE["fetched_at"] < MASTER_CACHE_TTL)
+
 def load_master_rows(force: bool = False) -> List[Dict[str, str]]:
-    now = time.time()
-    if (not force and _MASTER_CACHE["rows"] is not None and (now - _MASTER_CACHE["fetched_at"] < MASTER_CACHE_TTL)):
+    if not force and _master_fresh(time.time()):
         return _MASTER_CACHE["rows"]
 
-    res = SESSION.get(MASTER_CSV, timeout=25)
-    if res.status_code != 200:
-        raise HTTPException(status_code=502, detail="Failed to fetch Dhan master CSV")
+    # Single-flight: while one request refreshes, others keep serving the previous rows
+    # instead of queueing behind a multi-MB download (cold start still waits on the lock)
+    if not force and _MASTER_CACHE["rows"] is not None and _MASTER_LOCK.locked():
+        return _MASTER_CACHE["rows"]
 
-    rows = list(csv.DictReader(StringIO(res.text)))
-    _MASTER_CACHE["rows"] = rows
-    _MASTER_CACHE["fetched_at"] = now
-    _MASTER_CACHE["nse_eq_universe"] = None
-    return rows
+    with _MASTER_LOCK:
+        # re-check: another request may have refreshed while we waited on the lock
+        now = time.time()
+        if not force and _master_fresh(now):
+            return _MASTER_CACHE["rows"]
+
+        if not force and _MASTER_CACHE["rows"] is None:
+            rows = _load_master_snapshot(now)
+            if rows is not None:
+                _MASTER_CACHE["rows"] = rows
+                _invalidate_derived()
+                return rows
+
+        # Stream + parse while downloading: the decoded body never sits in memory as one str
+        res = SESSION.get(MASTER_CSV, stream=True, headers={"Accept-Encoding": "gzip"}, timeout=25)
+        if res.status_code != 200:
+            res.close()
+            raise HTTPException(status_code=502, detail="Failed to fetch Dhan master CSV")
+
+        # 64 KiB reads off the (gzip-decoded) socket stream; the parser consumes them as they arrive
+        res.raw.decode_content = True
+        res.raw.auto_close = False  # urllib3 2.x closes raw at EOF; the text/csv layers read past it once more
+        with res:
+            stream = io.BufferedReader(res.raw, buffer_size=64 * 1024)
+            rows = _parse_master_csv(io.TextIOWrapper(stream, encoding="utf-8", errors="ignore", newline=""))
+        _MASTER_CACHE["rows"] = rows
+        _MASTER_CACHE["fetched_at"] = now
+        _invalidate_derived()
+        _save_master_snapshot(rows)
+        return rows
 
 def build_nse_eq_universe(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """
@@ -97,22 +319,18 @@ def build_nse_eq_universe(force_refresh: bool = False) -> List[Dict[str, Any]]:
     if _MASTER_CACHE["nse_eq_universe"] is not None:
         return _MASTER_CACHE["nse_eq_universe"]
 
-    rows = load_master_rows()
+    version, rows = _derived_source()
     universe: List[Dict[str, Any]] = []
     seen = set()
 
     for r in rows:
-        exch = (r.get("EXCH_ID") or "").strip().upper()
-        seg = (r.get("SEGMENT") or "").strip().upper()
-        series = (r.get("SERIES") or "").strip().upper()
-
-        if exch != "NSE" or seg != "E" or series != "EQ":
+        if r["_EXCH_U"] != "NSE" or r["_SEG_U"] != "E" or r["_SERIES_U"] != "EQ":
             continue
 
         sid_raw = (r.get("SECURITY_ID") or "").strip()
         sym = (r.get("SYMBOL_NAME") or "").strip()
         disp = (r.get("DISPLAY_NAME") or "").strip()
-        instr = (r.get("INSTRUMENT") or "").strip().upper()
+        instr = r["_INSTR_U"]
 
         if not sid_raw or not sym:
             continue
@@ -127,75 +345,219 @@ def build_nse_eq_universe(force_refresh: bool = False) -> List[Dict[str, Any]]:
         except Exception:
             continue
 
-        key = (security_id, sym)
-        if key in seen:
+        # NSE EQ security ids are unique per listing: one int hash, no tuple per row
+        if security_id in seen:
             continue
-        seen.add(key)
+        seen.add(security_id)
 
         universe.append({"security_id": security_id, "symbol_name": sym, "display_name": disp or sym})
 
-    _MASTER_CACHE["nse_eq_universe"] = universe
+    _store_derived("nse_eq_universe", version, universe)
     return universe
 
+@dataclass(slots=True, frozen=True)
+class Contract:
+    display_name: Optional[str]
+    strike: Optional[Union[int, float]]
+    option_type: Optional[str]
+    lot_size: Optional[int]
+    expiry: Optional[str]
+    security_id: int
+
+def _parse_contract(r: Dict[str, str]) -> Optional[Contract]:
+    sec_raw = (r.get("SECURITY_ID") or "").strip()
+    try:
+        sec_id = int(float(sec_raw))
+    except Exception:
+        return None
+
+    strike_raw = (r.get("STRIKE_PRICE") or "").strip()
+    strike = None
+    if strike_raw:
+        try:
+            strike_val = float(strike_raw)
+            strike = int(strike_val) if strike_val.is_integer() else strike_val
+        except Exception:
+            strike = None
+
+    lot_raw = (r.get("LOT_SIZE") or "").strip()
+    try:
+        lot_size = int(float(lot_raw)) if lot_raw else None
+    except Exception:
+        lot_size = None
+
+    return Contract(
+        display_name=r.get("DISPLAY_NAME"),
+        strike=strike,
+        option_type=r.get("OPTION_TYPE"),
+        lot_size=lot_size,
+        expiry=r.get("SM_EXPIRY_DATE"),
+        security_id=sec_id,
+    )
+
+OptionsKey = Tuple[str, Optional[str]]
+
+def build_options_index() -> Dict[OptionsKey, Dict[str, List[Contract]]]:
+    """
+    Option contracts grouped by underlying + expiry (built once per master refresh):
+      {(UNDERLYING_SYMBOL, SM_EXPIRY_DATE): {"ALL": [...], "CE": [...], "PE": [...]}}
+    (UNDERLYING_SYMBOL, None) holds every expiry, so an expiry filter is a dict lookup.
+    """
+    version, rows = _derived_source()
+    if _MASTER_CACHE["options_index"] is not None:
+        return _MASTER_CACHE["options_index"]
+
+    index: Dict[OptionsKey, Dict[str, List[Contract]]] = {}
+    for r in rows:
+        instr, und, opt_type = _OPTION_FIELDS(r)
+        if instr not in OPTION_INSTRUMENTS:
+            continue
+
+        c = _parse_contract(r)
+        if c is None:
+            continue
+
+        keys = ((und, None),) if not c.expiry else ((und, None), (und, c.expiry))
+        for key in keys:
+            bucket = index.get(key)
+            if bucket is None:
+                bucket = index[key] = {"ALL": [], "CE": [], "PE": []}
+
+            bucket["ALL"].append(c)
+            if opt_type in OPTION_TYPES:
+                bucket[opt_type].append(c)
+
+    _store_derived("options_index", version, index)
+    return index
+
 # =========================================================
 # 📊 SYMBOL RESOLVER
 # =========================================================
-def resolve_symbol(symbol: str) -> Dict[str, str]:
-    rows = load_master_rows()
-    s = _norm(symbol)
+def build_symbol_index() -> Dict[str, Dict[str, str]]:
+    """
+    Normalized SYMBOL_NAME / DISPLAY_NAME / UNDERLYING_SYMBOL -> best row
+    (first NSE row in CSV order, else first row), built once per master refresh.
+    """
+    version, rows = _derived_source()
+    if _MASTER_CACHE["symbol_index"] is not None:
+        return _MASTER_CACHE["symbol_index"]
 
-    exact = []
+    index: Dict[str, Dict[str, str]] = {}
+    nse_keys = set()
     for r in rows:
-        sym = _norm(r.get("SYMBOL_NAME", ""))
-        disp = _norm(r.get("DISPLAY_NAME", ""))
-        und = _norm(r.get("UNDERLYING_SYMBOL", ""))
-        if s == sym or s == disp or s == und:
-            exact.append(r)
-
-    if exact:
-        for r in exact:
-            if (r.get("EXCH_ID") or "").upper() == "NSE":
-                return r
-        return exact[0]
-
-    candidates = []
-    for r in rows:
-        combined = _norm(" ".join([r.get("SYMBOL_NAME", ""), r.get("DISPLAY_NAME", ""), r.get("UNDERLYING_SYMBOL", "")]))
-        if s and s in combined:
-            candidates.append(r)
+        is_nse = r["_EXCH_U"] == "NSE"
+        for name in _NAME_FIELDS(r):
+            key = _norm(name)
+            if key not in index or (is_nse and key not in nse_keys):
+                index[key] = r
+                if is_nse:
+                    nse_keys.add(key)
+
+    _store_derived("symbol_index", version, index)
+    return index
+
+@lru_cache(maxsize=4096)
+def _resolve_cached(s: str, version: int) -> Optional[Dict[str, str]]:
+    # version is only part of the key: entries from an older master CSV never match
+    hit = build_symbol_index().get(s)
+    if hit is not None:
+        return hit
+
+    rows = load_master_rows()
 
+    candidates = [r for r in rows if s in r["_NAME_N"]] if s else []
     if not candidates:
-        raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found in Dhan master CSV.")
+        return None
 
     for r in candidates:
-        if (r.get("EXCH_ID") or "").upper() == "NSE":
+        if r["_EXCH_U"] == "NSE":
             return r
     return candidates[0]
 
+def resolve_symbol(symbol: str) -> Dict[str, str]:
+    load_master_rows()  # refresh first so the memo is keyed by the current version
+    row = _resolve_cached(_norm(symbol), _MASTER_CACHE["version"])
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Symbol '{symbol}' not found in Dhan master CSV.")
+    return row
+
 # =========================================================
-# 🏠 ROOT + HEALTH
+# 🔐 API KEY (optional)
 # =========================================================
-@app.get("/")
-def home():
-    return {
-        "status": "ok",
-        "version": app.version,
-        "message": "Dhan FastAPI Bridge — BTST scan + Options + Momentum + News",
-        "endpoints": {
-            "health": "/health",
-            "universe": "/universe",
-            "scan": "/scan?symbol=HINDUSTAN%20COPPER",
-            "scan_all": "/scan/all?limit=30",
-            "optionchain": "/optionchain?symbol=TCS",
-            "option_momentum": "/option/momentum?symbol=RELIANCE",
-            "news": "/news?symbol=RELIANCE"
-        },
-        "timestamp": ist_now_str()
-    }
+# Probes and the schema import (GPT Actions) stay open; frozenset lookup, not a list scan
+SKIP_PATHS = frozenset({"/", "/health", "/openapi.json"})
+
+_UNAUTHORIZED_BODY = orjson.dumps({"detail": "Invalid or missing API key"})
+
+class APIKeyMiddleware:
+    """
+    Pure ASGI check of the x-api-key header. Unlike @app.middleware("http") (BaseHTTPMiddleware),
+    this adds no per-request task/stream wrapper: it reads scope headers and either forwards the
+    call untouched or sends a canned 401.
+    """
+    def __init__(self, app, key: str):
+        self.app = app
+        self.key = key.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in SKIP_PATHS:
+            return await self.app(scope, receive, send)
+        k = b""
+        for name, value in scope["headers"]:  # ASGI header names are already lower-cased bytes
+            if name == b"x-api-key":
+                k = value
+                break
+        # compare_digest: constant-time, so a wrong key leaks nothing through response timing
+        if len(k) == len(self.key) and hmac.compare_digest(k, self.key):
+            return await self.app(scope, receive, send)
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_UNAUTHORIZED_BODY)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": _UNAUTHORIZED_BODY})
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok", "time": ist_now_str()}
+if GPT_API_KEY:
+    app.add_middleware(APIKeyMiddleware, key=GPT_API_KEY)
+
+# =========================================================
+# 🏠 ROOT + HEALTH
+# =========================================================
+# Constant part of the root response, built once; only the timestamp varies per call
+_HOME = {
+    "status": "ok",
+    "version": app.version,
+    "message": "Dhan FastAPI Bridge — BTST scan + Options + Momentum + News",
+    "endpoints": {
+        "health": "/health",
+        "universe": "/universe",
+        "scan": "/scan?symbol=HINDUSTAN%20COPPER",
+        "scan_all": "/scan/all?limit=30",
+        "optionchain": "/optionchain?symbol=TCS",
+        "option_momentum": "/option/momentum?symbol=RELIANCE",
+        "news": "/news?symbol=RELIANCE"
+    },
+}
+
+# Probe endpoints: body encoded at most once per second, then the same bytes are reused
+@lru_cache(maxsize=1)
+def _home_bytes_at(epoch_sec: int) -> bytes:
+    return orjson.dumps({**_HOME, "timestamp": _ist_str_at(epoch_sec)})
+
+@lru_cache(maxsize=1)
+def _health_bytes_at(epoch_sec: int) -> bytes:
+    return orjson.dumps({"status": "ok", "time": _ist_str_at(epoch_sec)})
+
+@app.get("/", response_class=Response)
+async def home():
+    return Response(_home_bytes_at(int(_now())), media_type="application/json")
+
+@app.get("/health", response_class=Response)
+async def health_check():
+    return Response(_health_bytes_at(int(_now())), media_type="application/json")
 
 # =========================================================
 # ✅ UNIVERSE DEBUG
@@ -205,7 +567,7 @@ def universe_debug(
     q: str = Query(None, description="Search symbol/display"),
     sample: int = Query(20, ge=1, le=100),
     refresh: bool = Query(False, description="Force refresh master CSV cache")
-):
+) -> Dict[str, Any]:
     u = build_nse_eq_universe(force_refresh=refresh)
     if q:
         nq = _norm(q)
@@ -223,7 +585,7 @@ def universe_debug(
 # 📰 NEWS (MARKETAUX)
 # =========================================================
 @app.get("/news")
-def get_news(symbol: str = Query(...)):
+async def get_news(symbol: str = Query(...)) -> Dict[str, Any]:
     try:
         if not MARKETAUX_API_KEY:
             return {"status": "error", "reason": "Missing MarketAux API key", "timestamp": ist_now_str()}
@@ -232,11 +594,11 @@ def get_news(symbol: str = Query(...)):
             "https://api.marketaux.com/v1/news/all"
             f"?symbols={symbol}&language=en&filter_entities=true&api_token={MARKETAUX_API_KEY}"
         )
-        res = SESSION.get(url, timeout=10)
+        res = await CLIENT.get(url, timeout=10)
         if res.status_code != 200:
             raise HTTPException(status_code=502, detail="MarketAux API fetch failed")
 
-        articles = res.json().get("data", [])[:5]
+        articles = orjson.loads(res.content).get("data", [])[:5]
         return {
             "status": "success",
             "symbol": symbol.upper(),
@@ -257,17 +619,123 @@ def get_news(symbol: str = Query(...)):
 # =========================================================
 # 🔌 DHAN QUOTE (BATCH)
 # =========================================================
-def dhan_quote_batch(quote_key: str, security_ids: List[int]) -> Dict[str, Any]:
+class TokenBucket:
+    """Async token bucket: bursts while under budget, waits only near the limit."""
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_sec)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.refill_per_sec)
+
+# Dhan marketfeed/quote accepts up to 1000 instruments per request
+QUOTE_MAX_INSTRUMENTS = 1000
+
+# Quote POST budget (default matches the old fixed 0.25s pacing, but allows bursts)
+_QUOTE_RATE = TokenBucket(
+    capacity=float(os.getenv("DHAN_QUOTE_BURST", 5)),
+    refill_per_sec=float(os.getenv("DHAN_QUOTE_RPS", 4)),
+)
+
+# Per-instrument quote cache: absorbs repeated /scan hits and overlapping scans
+QUOTE_CACHE_TTL = 3  # seconds
+QUOTE_CACHE_MAX = 10000
+_QUOTE_CACHE: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}  # (quote_key, sid) -> (t, quote)
+
+def _quote_cache_put(quote_key: str, quotes: Dict[str, Any], now: float) -> None:
+    if len(_QUOTE_CACHE) + len(quotes) > QUOTE_CACHE_MAX:
+        for k in [k for k, (t, _) in _QUOTE_CACHE.items() if now - t >= QUOTE_CACHE_TTL]:
+            del _QUOTE_CACHE[k]
+        if len(_QUOTE_CACHE) + len(quotes) > QUOTE_CACHE_MAX:
+            _QUOTE_CACHE.clear()
+    for sid, q in quotes.items():
+        _QUOTE_CACHE[(quote_key, sid)] = (now, q)
+
+# In-flight quote fetches: concurrent requests for the same id await one upstream POST
+class _QuoteLeaderCancelled(Exception):
+    """Set on in-flight futures whose fetching request was cancelled: followers re-fetch."""
+
+_QUOTE_INFLIGHT: Dict[Tuple[str, str], "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+
+async def dhan_quote_batch(quote_key: str, security_ids: List[int]) -> Dict[str, Any]:
+    now = time.time()
+    out: Dict[str, Any] = {}
+    missing: List[int] = []
+    waiting: List[Tuple[str, "asyncio.Future[Optional[Dict[str, Any]]]"]] = []
+    for sid in security_ids:
+        key = (quote_key, str(sid))
+        hit = _QUOTE_CACHE.get(key)
+        if hit and now - hit[0] < QUOTE_CACHE_TTL:
+            out[key[1]] = hit[1]
+        elif key in _QUOTE_INFLIGHT:
+            waiting.append((key[1], _QUOTE_INFLIGHT[key]))
+        else:
+            missing.append(sid)
+
+    if missing:
+        loop = asyncio.get_running_loop()
+        futs = {str(sid): loop.create_future() for sid in missing}
+        for sid_s, fut in futs.items():
+            _QUOTE_INFLIGHT[(quote_key, sid_s)] = fut
+        try:
+            fetched = await _dhan_quote_post(quote_key, missing)
+        except asyncio.CancelledError:
+            # never cancel the shared futures: other requests await them
+            _fail_inflight(futs, _QuoteLeaderCancelled())
+            raise
+        except Exception as e:
+            _fail_inflight(futs, e)
+            raise
+        finally:
+            for sid_s in futs:
+                _QUOTE_INFLIGHT.pop((quote_key, sid_s), None)
+
+        _quote_cache_put(quote_key, fetched, time.time())
+        out.update(fetched)
+        for sid_s, fut in futs.items():
+            if not fut.done():
+                fut.set_result(fetched.get(sid_s))
+
+    refetch: List[int] = []
+    for sid_s, fut in waiting:
+        # shield: cancelling this request must not cancel the future other requests share
+        try:
+            q = await asyncio.shield(fut)
+        except _QuoteLeaderCancelled:
+            refetch.append(int(sid_s))
+            continue
+        if q is not None:
+            out[sid_s] = q
+    if refetch:
+        out.update(await dhan_quote_batch(quote_key, refetch))
+    return out
+
+def _fail_inflight(futs: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"], exc: BaseException) -> None:
+    for fut in futs.values():
+        if not fut.done():
+            fut.set_exception(exc)
+            fut.exception()  # followers re-raise it; don't log "never retrieved"
+
+async def _dhan_quote_post(quote_key: str, security_ids: List[int]) -> Dict[str, Any]:
     require_dhan_creds()
 
-    res = SESSION.post(
+    await _QUOTE_RATE.acquire()
+    res = await CLIENT.post(
         f"{DHAN_BASE}/marketfeed/quote",
-        json={quote_key: security_ids},
-        headers={
-            "access-token": DHAN_ACCESS_TOKEN,
-            "client-id": DHAN_CLIENT_ID,
-            "Content-Type": "application/json",
-        },
+        content=orjson.dumps({quote_key: security_ids}),  # orjson bytes, skips httpx's json.dumps
+        headers=_DHAN_HEADERS,
         timeout=8,
     )
 
@@ -276,26 +744,91 @@ def dhan_quote_batch(quote_key: str, security_ids: List[int]) -> Dict[str, Any]:
     if res.status_code != 200:
         raise HTTPException(status_code=502, detail=f"Dhan quote API failed ({res.status_code})")
 
-    data = res.json().get("data", {})
+    data = orjson.loads(res.content).get("data", {})
     return data.get(quote_key, {})
 
+async def dhan_quote_chunked(quote_key: str, security_ids: List[int], batch_size: int) -> Dict[str, Any]:
+    """Fetch all chunks concurrently; the token bucket keeps the fan-out under Dhan's rate limit."""
+    chunks = [security_ids[i:i + batch_size] for i in range(0, len(security_ids), batch_size)]
+    merged: Dict[str, Any] = {}
+    for part in await asyncio.gather(*(dhan_quote_batch(quote_key, chunk) for chunk in chunks)):
+        merged.update(part)
+    return merged
+
+# Single-symbol /scan calls landing within a few ms of each other share one quote POST
+QUOTE_MICROBATCH_MAX = 50
+QUOTE_MICROBATCH_WAIT = 0.005  # seconds
+
+class QuoteMicroBatcher:
+    """Collects single-id quote lookups for a short window, then fetches them as one batch."""
+
+    def __init__(self, max_batch: int, max_wait: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: Dict[str, List[Tuple[int, "asyncio.Future[Dict[str, Any]]"]]] = {}
+        self._tasks: set = set()
+
+    async def get(self, quote_key: str, security_id: int) -> Dict[str, Any]:
+        fut = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(quote_key, [])
+        batch.append((security_id, fut))
+        if len(batch) >= self.max_batch:
+            del self._pending[quote_key]  # full: later arrivals start a new batch
+            self._spawn(self._send(quote_key, batch))
+        elif len(batch) == 1:
+            self._spawn(self._flush_later(quote_key, batch))  # first arrival opens the window
+        return await fut
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)  # strong ref until done
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_later(self, quote_key: str, batch) -> None:
+        await asyncio.sleep(self.max_wait)
+        if self._pending.get(quote_key) is not batch:
+            return  # already sent when it filled up
+        del self._pending[quote_key]
+        await self._send(quote_key, batch)
+
+    async def _send(self, quote_key: str, batch) -> None:
+        try:
+            qmap = await dhan_quote_batch(quote_key, list(dict.fromkeys(sid for sid, _ in batch)))
+        except asyncio.CancelledError:
+            for _, fut in batch:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()  # only callers still waiting re-raise it
+            return
+        for sid, fut in batch:
+            if not fut.done():  # caller may have disconnected
+                fut.set_result(qmap.get(str(sid)) or {})
+
+_SCAN_QUOTES = QuoteMicroBatcher(QUOTE_MICROBATCH_MAX, QUOTE_MICROBATCH_WAIT)
+
 # =========================================================
 # 📈 SINGLE STOCK SCAN
 # =========================================================
 @app.get("/scan")
-def scan_single(symbol: str = Query(...)):
+async def scan_single(symbol: str = Query(...)) -> Dict[str, Any]:
     try:
-        equity = resolve_symbol(symbol)
+        # master CSV load/lookup is blocking: keep it off the event loop
+        equity = await run_in_threadpool(resolve_symbol, symbol)
         exch = (equity.get("EXCH_ID") or "").upper()
         security_id = int(float(equity["SECURITY_ID"]))
         quote_key = "NSE_EQ" if exch == "NSE" else "BSE_EQ"
 
-        qmap = dhan_quote_batch(quote_key, [security_id])
-        q = qmap.get(str(security_id), {}) or {}
+        q = await _SCAN_QUOTES.get(quote_key, security_id)
 
-        news_data = get_news(symbol)
+        news_data = await get_news(symbol)
         sentiment_summary = [f"{a.get('title')} ({a.get('sentiment')})" for a in news_data.get("articles", [])]
 
+        # Dict[str, Any] return type: FastAPI dumps it straight to JSON bytes via pydantic-core,
+        # no jsonable_encoder walk over the nested quote payload
         return {
             "status": "success",
             "symbol": equity.get("SYMBOL_NAME", symbol),
@@ -317,17 +850,17 @@ def scan_single(symbol: str = Query(...)):
 # ✅ Default = sample across whole universe (so GPT doesn’t need paging)
 # =========================================================
 @app.get("/scan/all")
-def scan_all(
+async def scan_all(
     limit: int = Query(30, ge=1, le=200),
     # SAFE DEFAULTS (avoid 429, also tool can’t pass these)
     max_symbols: int = Query(50, ge=20, le=200, description="How many symbols to scan per request"),
-    batch_size: int = Query(50, ge=20, le=100, description="Quote batch size per Dhan request"),
+    batch_size: int = Query(200, ge=20, le=QUOTE_MAX_INSTRUMENTS, description="Quote batch size per Dhan request"),
     only_today: bool = Query(True),
     # IMPORTANT: covers the whole universe without paging
     spread: bool = Query(True, description="If true, sample across the entire universe (recommended)."),
     spread_shift: int = Query(0, ge=0, le=5000, description="Shift start index for spread sampling"),
     mode: str = Query("btst", description="btst | morning"),
-):
+) -> Dict[str, Any]:
     """
     - mode=morning: focuses on intraday momentum vs OPEN.
     - mode=btst: adds close-near-high filter (still based on OPEN).
@@ -341,21 +874,19 @@ def scan_all(
         return resp
 
     try:
-        universe = build_nse_eq_universe()
+        universe = await run_in_threadpool(build_nse_eq_universe)
         universe_count = len(universe)
-        today = ist_today()
+        # LTT is "dd/mm/YYYY HH:MM[:SS]": a prefix compare replaces a strptime per row
+        today_prefix = ist_today().strftime("%d/%m/%Y ")
+        btst = mode.lower() == "btst"
 
         # Choose which symbols to scan
         if spread:
             # stride sample across entire universe so we don’t always scan the same first 50
+            # (one extended slice: O(max_symbols), no index list)
             stride = max(1, universe_count // max_symbols)
-            indices = []
             start = spread_shift % max(1, universe_count)
-            i = start
-            while len(indices) < max_symbols and i < universe_count:
-                indices.append(i)
-                i += stride
-            page = [universe[idx] for idx in indices if idx < universe_count]
+            page = universe[start:start + stride * max_symbols:stride]
         else:
             # sequential first N (not recommended unless you page manually)
             page = universe[:max_symbols]
@@ -363,13 +894,8 @@ def scan_all(
         security_ids = [x["security_id"] for x in page]
         quote_key = "NSE_EQ"
 
-        # Batch fetch with small throttle (reduces 429)
-        qmaps: Dict[str, Any] = {}
-        for i in range(0, len(security_ids), batch_size):
-            chunk = security_ids[i:i + batch_size]
-            qmaps.update(dhan_quote_batch(quote_key, chunk))
-            if i + batch_size < len(security_ids):
-                time.sleep(0.25)
+        # Batch fetch (throttled by the quote token bucket to avoid 429)
+        qmaps = await dhan_quote_chunked(quote_key, security_ids, batch_size)
 
         results = []
         skipped_no_quote = 0
@@ -386,11 +912,9 @@ def scan_all(
                 continue
 
             ltt = q.get("last_trade_time", "N/A")
-            if only_today:
-                d = parse_last_trade_date(ltt)
-                if d is None or d != today:
-                    skipped_stale += 1
-                    continue
+            if only_today and not (ltt or "").startswith(today_prefix):
+                skipped_stale += 1
+                continue
 
             ohlc = q.get("ohlc", {}) or {}
             day_open = ohlc.get("open") or 0
@@ -416,7 +940,7 @@ def scan_all(
             bearish = pct_vs_open <= -1.2
 
             # For BTST, we prefer close nearer to high (range_pos)
-            if mode.lower() == "btst":
+            if btst:
                 if bullish and range_pos >= 0.70:
                     bias, confidence = "BULLISH", 85
                 elif bearish and range_pos <= 0.30:
@@ -443,8 +967,8 @@ def scan_all(
                 "last_trade_time": ltt
             })
 
-        # Sort: confidence then pct_vs_open
-        results.sort(key=lambda x: (x["confidence"], x["pct_vs_open"]), reverse=True)
+        # Top-N by confidence then pct_vs_open (partial selection, no full sort)
+        top_results = heapq.nlargest(limit, results, key=itemgetter("confidence", "pct_vs_open"))
 
         resp = {
             "status": "success",
@@ -461,7 +985,7 @@ def scan_all(
             "symbols_scanned": len(results),
             "skipped_no_quote": skipped_no_quote,
             "skipped_stale": skipped_stale,
-            "top_results": results[:limit]
+            "top_results": top_results
         }
 
         _SCAN_CACHE[cache_key] = {"t": now, "resp": resp}
@@ -478,57 +1002,20 @@ def scan_all(
 # ⚙️ OPTION CHAIN (LIST CONTRACTS)
 # =========================================================
 @app.get("/optionchain")
-def optionchain(symbol: str = Query(...), expiry: str = Query(None)):
+def optionchain(symbol: str = Query(...), expiry: str = Query(None)) -> Dict[str, Any]:
     try:
-        rows = load_master_rows()
-        contracts = []
-
-        for r in rows:
-            if (
-                (r.get("UNDERLYING_SYMBOL") or "").upper() == symbol.upper()
-                and "OPT" in (r.get("INSTRUMENT") or "").upper()
-                and (not expiry or (r.get("SM_EXPIRY_DATE") == expiry))
-            ):
-                strike_raw = (r.get("STRIKE_PRICE") or "").strip()
-                strike = None
-                if strike_raw:
-                    try:
-                        strike_val = float(strike_raw)
-                        strike = int(strike_val) if strike_val.is_integer() else strike_val
-                    except Exception:
-                        strike = None
-
-                sec_raw = (r.get("SECURITY_ID") or "").strip()
-                try:
-                    sec_id = int(float(sec_raw))
-                except Exception:
-                    continue
-
-                lot_raw = (r.get("LOT_SIZE") or "").strip()
-                lot_size = None
-                try:
-                    lot_size = int(float(lot_raw)) if lot_raw else None
-                except Exception:
-                    lot_size = None
-
-                contracts.append({
-                    "display_name": r.get("DISPLAY_NAME"),
-                    "strike": strike,
-                    "option_type": r.get("OPTION_TYPE"),
-                    "lot_size": lot_size,
-                    "expiry": r.get("SM_EXPIRY_DATE"),
-                    "security_id": sec_id,
-                })
+        sym = sys.intern(symbol.upper())
+        contracts = build_options_index().get((sym, expiry or None), {}).get("ALL", [])
 
         if not contracts:
             raise HTTPException(status_code=404, detail=f"No option data found for {symbol}")
 
         return {
             "status": "success",
-            "symbol": symbol.upper(),
-            "expiry": expiry or contracts[0].get("expiry"),
+            "symbol": sym,
+            "expiry": expiry or contracts[0].expiry,
             "contracts_count": len(contracts),
-            "contracts": contracts[:50],
+            "contracts": [asdict(c) for c in contracts[:50]],
             "timestamp": ist_now_str()
         }
 
@@ -541,63 +1028,32 @@ def optionchain(symbol: str = Query(...), expiry: str = Query(None)):
 # 💥 OPTION MOMENTUM (SUBSET)
 # =========================================================
 @app.get("/option/momentum")
-def option_momentum(symbol: str = Query(...), expiry: str = Query(None)):
+async def option_momentum(symbol: str = Query(...), expiry: str = Query(None)) -> Dict[str, Any]:
     try:
         require_dhan_creds()
-        rows = load_master_rows()
-
-        options = [
-            r for r in rows
-            if (r.get("UNDERLYING_SYMBOL") or "").upper() == symbol.upper()
-            and "OPT" in (r.get("INSTRUMENT") or "").upper()
-            and (not expiry or r.get("SM_EXPIRY_DATE") == expiry)
-        ]
-
-        records_meta: Dict[int, Dict[str, Any]] = {}
-        sec_ids: List[int] = []
+        sym = sys.intern(symbol.upper())
+        bucket = (await run_in_threadpool(build_options_index)).get((sym, expiry or None), {})
 
-        for opt in options[:120]:
-            opt_type = (opt.get("OPTION_TYPE") or "").upper()
-            if opt_type not in ("CE", "PE"):
-                continue
-
-            sec_raw = (opt.get("SECURITY_ID") or "").strip()
-            try:
-                sec_id = int(float(sec_raw))
-            except Exception:
-                continue
+        # CE/PE are pre-split at index time: 60 of each, no per-row type check
+        selected = []
+        for opt_type in ("CE", "PE"):
+            selected.extend((opt_type, c) for c in bucket.get(opt_type, [])[:60])
 
-            strike_raw = (opt.get("STRIKE_PRICE") or "").strip()
-            try:
-                strike = float(strike_raw) if strike_raw else 0.0
-            except Exception:
-                strike = 0.0
-
-            records_meta[sec_id] = {"strike": strike, "option_type": opt_type}
-            sec_ids.append(sec_id)
+        # Reverse map keyed like Dhan's response ("<security_id>") -> O(1) enrichment, no int() per key
+        by_sid = {str(c.security_id): (opt_type, c) for opt_type, c in selected}
 
         quote_key = "NSE_D"
-        quotes: Dict[str, Any] = {}
-        for i in range(0, len(sec_ids), 200):
-            chunk = sec_ids[i:i + 200]
-            quotes.update(dhan_quote_batch(quote_key, chunk))
-            if i + 200 < len(sec_ids):
-                time.sleep(0.25)
+        quotes = await dhan_quote_chunked(quote_key, [c.security_id for _, c in selected], QUOTE_MAX_INSTRUMENTS)
 
         ce_list, pe_list = [], []
         for sec_id_str, q in quotes.items():
-            try:
-                sid = int(sec_id_str)
-            except Exception:
-                continue
-
-            meta = records_meta.get(sid)
+            meta = by_sid.get(sec_id_str)
             if not meta:
                 continue
 
+            opt_type, c = meta
             qq = q or {}
-            strike = meta.get("strike", 0.0)
-            opt_type = meta.get("option_type", "NA")
+            strike = float(c.strike) if c.strike is not None else 0.0
 
             oi = qq.get("oi", 0) or 0
             ltp = qq.get("last_price", 0) or 0
@@ -611,18 +1067,17 @@ def option_momentum(symbol: str = Query(...), expiry: str = Query(None)):
             else:
                 pe_list.append(rec)
 
-        ce_momentum = [x for x in ce_list if x["change"] > 0 and x["oi"] > 0]
-        pe_opportunities = [x for x in pe_list if x["change"] > 0 and x["oi"] > 0]
-
-        ce_momentum.sort(key=lambda x: (x["change"], x["oi"]), reverse=True)
-        pe_opportunities.sort(key=lambda x: (x["change"], x["oi"]), reverse=True)
+        # Top-3 only: partial selection instead of sorting the whole list
+        rank = lambda x: (x["change"], x["oi"])
+        ce_momentum = heapq.nlargest(3, (x for x in ce_list if x["change"] > 0 and x["oi"] > 0), key=rank)
+        pe_opportunities = heapq.nlargest(3, (x for x in pe_list if x["change"] > 0 and x["oi"] > 0), key=rank)
 
         return {
             "status": "success",
-            "symbol": symbol.upper(),
+            "symbol": sym,
             "expiry": expiry or "nearest",
-            "momentum_breakouts": ce_momentum[:3],
-            "pe_opportunities": pe_opportunities[:3],
+            "momentum_breakouts": ce_momentum,
+            "pe_opportunities": pe_opportunities,
             "timestamp": ist_now_str()
         }
 
@@ -630,3 +1085,19 @@ def option_momentum(symbol: str = Query(...), expiry: str = Query(None)):
         raise
     except Exception as e:
         return {"status": "error", "reason": str(e), "timestamp": ist_now_str()}
+
+# =========================================================
+# 🚀 LOCAL RUN (Procfile / Vercel import `app` directly)
+# =========================================================
+if __name__ == "__main__":
+    import uvicorn
+
+    # Workers from WEB_CONCURRENCY (default 1): caches and the quote rate budget are per process
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", 8000)),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+    )
@@ -1,10 +1,17 @@
-import json
 from functools import lru_cache
 from pathlib import Path
 
+import orjson
+
 UNIVERSE_FILE = Path("data/universe_nse_eq.json")
 
 @lru_cache(maxsize=1)
 def load_universe():
-    data = json.loads(UNIVERSE_FILE.read_text(encoding="utf-8"))
+    # orjson parses the raw bytes: no separate utf-8 decode into a file-sized str
+    data = orjson.loads(UNIVERSE_FILE.read_bytes())
     return data["universe"]
+
+@lru_cache(maxsize=1)
+def symbol_index():
+    # symbol -> security_id, built once so lookups are O(1) instead of scanning the list
+    return {u["symbol"]: u["security_id"] for u in load_universe()}
@@ -0,0 +1,70 @@
+import gzip
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+HEADER = "EXCH_ID,SEGMENT,SECURITY_ID,INSTRUMENT,UNDERLYING_SYMBOL,SYMBOL_NAME,DISPLAY_NAME,SERIES,LOT_SIZE,SM_EXPIRY_DATE,STRIKE_PRICE,OPTION_TYPE\n"
+# ~200 KB: several 64 KiB buffer fills, so rows straddle read boundaries
+ROWS = [f"NSE,E,{1000 + i},EQUITY,SYM{i},SYM{i},Symbol {i} Ltd,EQ,1.0,,,\n" for i in range(4000)]
+ROWS.append("NSE,D,50001,OPTSTK,RELIANCE,RELIANCE-Oct2026-2500-CE,RELIANCE 2500 CE,,250.0,2026-10-29,2500.00000,CE\n")
+CSV = (HEADER + "".join(ROWS)).encode()
+
+
+class _MasterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = gzip.compress(CSV) if self.server.use_gzip else CSV
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        if self.server.use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        if self.server.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(body), 8192):
+                part = body[i:i + 8192]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(params=[(False, False), (True, False), (False, True), (True, True)],
+                ids=["plain", "gzip", "plain-chunked", "gzip-chunked"])
+def master_server(request, monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MasterHandler)
+    server.use_gzip, server.chunked = request.param
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(main, "MASTER_CSV", f"http://127.0.0.1:{server.server_port}/master.csv")
+    monkeypatch.setattr(main, "MASTER_DISK_CACHE", str(tmp_path / "master.json"))
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def test_load_master_rows_parses_a_streamed_response(master_server):
+    rows = main.load_master_rows(force=True)
+
+    assert len(rows) == len(ROWS)
+    assert [r["SECURITY_ID"] for r in rows[:2]] == ["1000", "1001"]
+    assert rows[-2]["DISPLAY_NAME"] == "Symbol 3999 Ltd"
+    assert rows[-1]["_OPT_U"] == "CE"
+
+
+def test_snapshot_round_trips_the_downloaded_rows(master_server):
+    rows = main.load_master_rows(force=True)
+
+    # columns stored once, raw values only: about the size of the projected CSV, not several times it
+    assert os.path.getsize(main.MASTER_DISK_CACHE) < 1.5 * len(CSV)
+    assert main._load_master_snapshot(time.time()) == rows
@@ -0,0 +1,63 @@
+import asyncio
+
+import main
+
+
+def _run(coro):
+    main._QUOTE_CACHE.clear()
+    main._QUOTE_INFLIGHT.clear()
+    return asyncio.run(coro)
+
+
+def test_cancelled_follower_does_not_break_leader_or_other_followers(monkeypatch):
+    calls = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def fake_post(quote_key, ids):
+            calls.append(list(ids))
+            await gate.wait()
+            return {str(i): {"last_price": i} for i in ids}
+
+        monkeypatch.setattr(main, "_dhan_quote_post", fake_post)
+        leader = asyncio.create_task(main.dhan_quote_batch("NSE_EQ", [1]))
+        await asyncio.sleep(0)
+        follower_a = asyncio.create_task(main.dhan_quote_batch("NSE_EQ", [1]))
+        follower_b = asyncio.create_task(main.dhan_quote_batch("NSE_EQ", [1]))
+        await asyncio.sleep(0)
+
+        follower_a.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+
+        assert await leader == {"1": {"last_price": 1}}
+        assert await follower_b == {"1": {"last_price": 1}}
+        assert follower_a.cancelled()
+
+    _run(scenario())
+    assert calls == [[1]]
+
+
+def test_cancelled_leader_lets_followers_refetch(monkeypatch):
+    calls = []
+
+    async def scenario():
+        async def fake_post(quote_key, ids):
+            calls.append(list(ids))
+            if len(calls) == 1:
+                await asyncio.sleep(3600)  # leader's POST: cancelled below
+            return {str(i): {"last_price": i} for i in ids}
+
+        monkeypatch.setattr(main, "_dhan_quote_post", fake_post)
+        leader = asyncio.create_task(main.dhan_quote_batch("NSE_EQ", [7]))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(main.dhan_quote_batch("NSE_EQ", [7]))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        assert await follower == {"7": {"last_price": 7}}
+        assert leader.cancelled()
+
+    _run(scenario())
+    assert calls == [[7], [7]]